@@ -3,12 +3,29 @@ import json
 import urllib.parse
 from datetime import datetime
 import uuid
+import sys
 
 # In-memory storage
 users = []
 conversations = []
 messages = []
 
+def load_ndjson(path):
+    """Seed in-memory storage from a db_transfer.py export"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop('type', None)
+            if kind == 'user':
+                users.append(record)
+            elif kind == 'conversation':
+                conversations.append(record)
+            elif kind == 'message':
+                record.setdefault('isRead', False)
+                messages.append(record)
+
 class ChatHandler(BaseHTTPRequestHandler):
     def _set_cors_headers(self):
         self.send_header('Access-Control-Allow-Origin', 'http://localhost:5173')
@@ -271,6 +288,9 @@ class ChatHandler(BaseHTTPRequestHandler):
         self.wfile.write(json.dumps({'message': 'Not found'}).encode())
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        load_ndjson(sys.argv[1])
+        print(f"📥 Loaded {len(users)} users, {len(conversations)} conversations, {len(messages)} messages")
     server = HTTPServer(('localhost', 3001), ChatHandler)
     print("🚀 Multi-user chat server running on http://localhost:3001")
     print("📱 Ready for real Gmail logins and friend connections!")
@@ -5,17 +5,56 @@ import json
 import urllib.parse
 import sqlite3
 import os
+import contextlib
+import threading
+import time
 from datetime import datetime
 import uuid
+import db_maintenance
+from message_cache import MessageCache
+from rate_limit import RateLimiter
+
+# Measured from import so restart-to-ready time includes interpreter startup work
+PROCESS_STARTED = time.monotonic()
+
+PORT = 3001
 
 # Database setup
 DB_PATH = os.path.join(os.path.dirname(__file__), 'db', 'chat.db')
+_initialized_db_paths = set()
+_db_init_lock = threading.Lock()
+
+# Warmup: indexes read into the page cache and conversations preloaded into message_cache
+# COUNT(*) ignores INDEXED BY, so each index is scanned by counting a column it covers
+WARMUP_INDEXES = [
+    ('messages', 'idx_messages_conversation', 'created_at'),
+    ('conversation_participants', 'idx_participants_user', 'conversation_id'),
+]
+WARMUP_CONVERSATIONS = 200
+
+# Set once warmup is done; until then only health/readiness probes are served
+_ready = threading.Event()
+_startup_stats = {}
+
+# Tail of recently read/written conversations, kept in process
+message_cache = MessageCache()
+
+# Per-route token buckets and global in-flight cap
+rate_limiter = RateLimiter()
+
+# Participants returned per conversation in the inbox (enough for avatars)
+INBOX_PARTICIPANT_PREVIEW = 3
 
-def init_database():
+def init_database(db_path=DB_PATH):
     """Initialize SQLite database with tables"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # WAL lets the maintenance thread work alongside request handling;
+    # auto_vacuum only takes effect on a fresh database file
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    cursor.execute('PRAGMA journal_mode = WAL')
+    
     # Create tables
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -32,10 +71,19 @@ def init_database():
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS conversations (
             id TEXT PRIMARY KEY,
+            is_group INTEGER DEFAULT 0,
+            name TEXT,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
+    # Databases created before group support lack these columns
+    conversation_columns = [row[1] for row in cursor.execute('PRAGMA table_info(conversations)')]
+    if 'is_group' not in conversation_columns:
+        cursor.execute('ALTER TABLE conversations ADD COLUMN is_group INTEGER DEFAULT 0')
+    if 'name' not in conversation_columns:
+        cursor.execute('ALTER TABLE conversations ADD COLUMN name TEXT')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS conversation_participants (
             conversation_id TEXT,
@@ -58,10 +106,42 @@ def init_database():
         )
     ''')
     
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation
+        ON messages (conversation_id, created_at)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_participants_user
+        ON conversation_participants (user_id, conversation_id)
+    ''')
+    
+    db_maintenance.init_retention_table(cursor)
+    
     conn.commit()
     conn.close()
     print("✅ Database initialized and ready!")
 
+def ensure_database(db_path=None):
+    """Run init_database once per database file, on first use rather than at import"""
+    db_path = os.path.abspath(db_path or DB_PATH)
+    with _db_init_lock:
+        if db_path not in _initialized_db_paths:
+            init_database(db_path)
+            _initialized_db_paths.add(db_path)
+            _warn_unfinished_imports(db_path)
+
+def _warn_unfinished_imports(db_path):
+    """db_transfer.py drops secondary indexes until an import finishes"""
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        try:
+            sources = [row[0] for row in conn.execute('SELECT source FROM import_progress')]
+        except sqlite3.OperationalError:
+            return
+    for source in sources:
+        print(f"⚠️ Unfinished import of {source}; queries may be slow until it is resumed "
+              f"(python db_transfer.py import --resume {source})")
+
 def get_users():
     """Get all users from database"""
     conn = sqlite3.connect(DB_PATH)
@@ -91,72 +171,149 @@ def update_user_online(user_id, is_online):
     conn.close()
 
 def get_conversations_for_user(user_id):
-    """Get all conversations for a user"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT DISTINCT c.id, c.created_at
-        FROM conversations c
-        JOIN conversation_participants cp ON c.id = cp.conversation_id
-        WHERE cp.user_id = ?
-    ''', (user_id,))
+    """Get all conversations for a user in one query, whatever the group sizes"""
+    with contextlib.closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute('''
+            SELECT c.id, c.created_at, c.is_group, c.name, lm.content, lm.created_at,
+                (SELECT COUNT(*) FROM conversation_participants WHERE conversation_id = c.id),
+                (SELECT json_group_array(json_object(
+                            'id', p.id, 'username', p.username,
+                            'displayName', p.display_name, 'isOnline', p.is_online))
+                 FROM (SELECT u.id, u.username, u.display_name, u.is_online
+                       FROM conversation_participants op
+                       JOIN users u ON u.id = op.user_id
+                       WHERE op.conversation_id = c.id AND op.user_id != ?
+                       LIMIT ?) p)
+            FROM conversation_participants cp
+            JOIN conversations c ON c.id = cp.conversation_id
+            LEFT JOIN messages lm ON lm.rowid = (
+                SELECT rowid FROM messages
+                WHERE conversation_id = c.id
+                ORDER BY created_at DESC, rowid DESC
+                LIMIT 1
+            )
+            WHERE cp.user_id = ?
+            ORDER BY COALESCE(lm.created_at, c.created_at) DESC
+        ''', (user_id, INBOX_PARTICIPANT_PREVIEW, user_id)).fetchall()
     
     conversations = []
-    for row in cursor.fetchall():
-        conv_id = row[0]
+    for row in rows:
+        is_group = bool(row[2])
+        participants = [dict(p, isOnline=bool(p['isOnline'])) for p in json.loads(row[7])]
+        if not is_group and not participants:
+            continue
         
-        # Get other participant
-        cursor.execute('''
-            SELECT u.id, u.username, u.display_name, u.is_online
-            FROM users u
-            JOIN conversation_participants cp ON u.id = cp.user_id
-            WHERE cp.conversation_id = ? AND u.id != ?
-        ''', (conv_id, user_id))
+        if is_group:
+            name = row[3] or ', '.join(p['displayName'] or p['username'] for p in participants)
+        else:
+            name = participants[0]['displayName'] or participants[0]['username']
         
-        other_user = cursor.fetchone()
-        if other_user:
-            # Get last message
-            cursor.execute('''
-                SELECT content, created_at
-                FROM messages
-                WHERE conversation_id = ?
-                ORDER BY created_at DESC
-                LIMIT 1
-            ''', (conv_id,))
-            
-            last_msg = cursor.fetchone()
-            
-            conversations.append({
-                'id': conv_id,
-                'name': other_user[2] or other_user[1],
-                'lastMessage': last_msg[0] if last_msg else '',
-                'lastMessageTime': last_msg[1] if last_msg else row[1],
-                'participants': [{
-                    'id': other_user[0],
-                    'username': other_user[1],
-                    'displayName': other_user[2],
-                    'isOnline': bool(other_user[3])
-                }]
-            })
+        conversations.append({
+            'id': row[0],
+            'name': name,
+            'isGroup': is_group,
+            'memberCount': row[6],
+            'lastMessage': row[4] or '',
+            'lastMessageTime': row[5] or row[1],
+            'participants': participants
+        })
     
-    conn.close()
     return conversations
 
-def save_message(message_data):
-    """Save message to database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create conversation if it doesn't exist
+def is_conversation_member(conversation_id, user_id):
+    """True if user_id participates in conversation_id"""
+    with contextlib.closing(sqlite3.connect(DB_PATH)) as conn:
+        row = conn.execute('''
+            SELECT 1 FROM conversation_participants
+            WHERE conversation_id = ? AND user_id = ?
+        ''', (conversation_id, user_id)).fetchone()
+    return row is not None
+
+def create_group_conversation(creator_id, name, member_ids):
+    """Create a group conversation; returns (id, member count), or None if the creator isn't a user"""
+    with contextlib.closing(sqlite3.connect(DB_PATH)) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM users WHERE id = ?', (creator_id,))
+        if not cursor.fetchone():
+            return None
+        
+        conv_id = str(uuid.uuid4())
+        cursor.execute('INSERT INTO conversations (id, is_group, name) VALUES (?, 1, ?)', (conv_id, name))
+        member_count = _insert_participants(cursor, conv_id, [creator_id] + list(member_ids))
+        conn.commit()
+    return conv_id, member_count
+
+def add_conversation_members(conversation_id, requester_id, member_ids):
+    """Add members to a group; returns the number added, or None if not allowed"""
+    with contextlib.closing(sqlite3.connect(DB_PATH)) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT c.is_group FROM conversations c
+            JOIN conversation_participants cp ON cp.conversation_id = c.id
+            WHERE c.id = ? AND cp.user_id = ?
+        ''', (conversation_id, requester_id))
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            return None
+        
+        added = _insert_participants(cursor, conversation_id, member_ids)
+        conn.commit()
+    return added
+
+def _is_id_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+def _insert_participants(cursor, conversation_id, user_ids):
+    # One statement for any number of members; unknown ids and existing members are skipped
     cursor.execute('''
-        SELECT conversation_id FROM conversation_participants 
-        WHERE user_id = ? AND conversation_id IN (
-            SELECT conversation_id FROM conversation_participants WHERE user_id = ?
-        )
-    ''', (message_data['senderId'], message_data['recipientId']))
+        INSERT OR IGNORE INTO conversation_participants (conversation_id, user_id)
+        SELECT ?, u.id FROM users u
+        WHERE u.id IN (SELECT value FROM json_each(?))
+    ''', (conversation_id, json.dumps(list(user_ids))))
+    return cursor.rowcount
+
+def save_message(message_data):
+    """Save message to database; returns the conversation id, or None if the sender isn't a member.
+
+    Messages go to message_data['conversationId'] when given (groups),
+    otherwise to the direct chat with message_data['recipientId'].
+    Either way a message is a single row, whatever the group size.
+    """
+    with contextlib.closing(sqlite3.connect(DB_PATH)) as conn:
+        # Take the write lock before looking up the conversation, so two
+        # concurrent first messages can't both create a direct chat
+        conn.execute('BEGIN IMMEDIATE')
+        conv_id, existing_conv, saved_row = _insert_message(conn.cursor(), message_data)
+        if not conv_id:
+            return None
+        conn.commit()
     
-    existing_conv = cursor.fetchone()
+    if saved_row:
+        message_cache.append(conv_id, _message_from_row(saved_row), new_conversation=not existing_conv)
+    else:
+        # Not cached, but a concurrent load may be about to put() a tail without this message
+        message_cache.invalidate(conv_id)
+    return conv_id
+
+def _insert_message(cursor, message_data):
+    if message_data.get('conversationId'):
+        cursor.execute('''
+            SELECT conversation_id FROM conversation_participants
+            WHERE conversation_id = ? AND user_id = ?
+        ''', (message_data['conversationId'], message_data['senderId']))
+        existing_conv = cursor.fetchone()
+        if not existing_conv:
+            return None, None, None
+    else:
+        # Find the direct (non-group) conversation between the two users
+        cursor.execute('''
+            SELECT cp.conversation_id FROM conversation_participants cp
+            JOIN conversations c ON c.id = cp.conversation_id
+            WHERE cp.user_id = ? AND c.is_group = 0 AND cp.conversation_id IN (
+                SELECT conversation_id FROM conversation_participants WHERE user_id = ?
+            )
+        ''', (message_data['senderId'], message_data['recipientId']))
+        existing_conv = cursor.fetchone()
     
     if not existing_conv:
         # Create new conversation
@@ -177,46 +334,146 @@ def save_message(message_data):
         VALUES (?, ?, ?, ?)
     ''', (message_data['id'], conv_id, message_data['senderId'], message_data['content']))
     
-    conn.commit()
-    conn.close()
-    return conv_id
+    # Keep the cached tail current instead of invalidating it
+    if not existing_conv or message_cache.is_cached(conv_id):
+        cursor.execute('''
+            SELECT m.id, m.content, m.sender_id, m.created_at, u.display_name, u.username
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.rowid = ?
+        ''', (cursor.lastrowid,))
+        saved_row = cursor.fetchone()
+    else:
+        saved_row = None
+    
+    return conv_id, existing_conv, saved_row
+
+def _message_from_row(row):
+    return {
+        'id': row[0],
+        'content': row[1],
+        'senderId': row[2],
+        'senderName': row[4] or row[5],
+        'senderAvatar': None,
+        'isRead': False,
+        'createdAt': row[3]
+    }
+
+def get_messages_for_conversation(conversation_id, include_archived=False, limit=None):
+    """Get messages for a conversation (the newest `limit` if given), optionally including archived history"""
+    if not include_archived:
+        cached = message_cache.get_tail(conversation_id, limit)
+        if cached is not None:
+            return cached
+    
+    # Taken before reading so put() can tell if a write landed in between
+    load_token = message_cache.load_token()
+    messages, complete = _read_messages(conversation_id, include_archived, limit)
+    
+    if not include_archived:
+        message_cache.put(conversation_id, messages, complete, load_token)
+    if limit is not None:
+        return messages[-limit:] if limit > 0 else []
+    return messages
 
-def get_messages_for_conversation(conversation_id):
-    """Get all messages for a conversation"""
+def _read_messages(conversation_id, include_archived, limit):
+    """Read messages from SQLite; returns (messages, complete) where complete
+    means nothing older exists in the main database"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT m.id, m.content, m.sender_id, m.created_at, u.display_name, u.username
-        FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        WHERE m.conversation_id = ?
-        ORDER BY m.created_at
-    ''', (conversation_id,))
+    rows = []
+    if include_archived:
+        rows.extend(db_maintenance.get_archived_messages(
+            cursor, conversation_id, db_maintenance.archive_path_for(DB_PATH)))
+    
+    if limit is None:
+        cursor.execute('''
+            SELECT m.id, m.content, m.sender_id, m.created_at, u.display_name, u.username
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.conversation_id = ?
+            ORDER BY m.created_at, m.rowid
+        ''', (conversation_id,))
+        recent = cursor.fetchall()
+        complete = True
+    else:
+        # Read at least a full cache tail so the next open is a hit
+        fetch_limit = max(limit, message_cache.tail_size)
+        cursor.execute('''
+            SELECT m.id, m.content, m.sender_id, m.created_at, u.display_name, u.username
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.conversation_id = ?
+            ORDER BY m.created_at DESC, m.rowid DESC
+            LIMIT ?
+        ''', (conversation_id, fetch_limit))
+        recent = cursor.fetchall()[::-1]
+        complete = len(recent) < fetch_limit
+    rows.extend(recent)
     
     messages = []
-    for row in cursor.fetchall():
-        messages.append({
-            'id': row[0],
-            'content': row[1],
-            'senderId': row[2],
-            'senderName': row[4] or row[3],
-            'senderAvatar': None,
-            'isRead': False,
-            'createdAt': row[3]
-        })
+    seen_ids = set()
+    for row in rows:
+        # A row may briefly exist in both databases if archiving was interrupted
+        if row[0] in seen_ids:
+            continue
+        seen_ids.add(row[0])
+        messages.append(_message_from_row(row))
     
     conn.close()
-    return messages
+    return messages, complete
 
-# Initialize database on startup
-init_database()
+def _is_retention_value(value, minimum):
+    return value is None or (type(value) is int and value >= minimum)
 
 class ChatHandler(http.server.SimpleHTTPRequestHandler):
+    def handle(self):
+        self._overloaded = not rate_limiter.begin_request()
+        try:
+            super().handle()
+        finally:
+            rate_limiter.end_request()
+
     def _set_cors_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.send_header('Access-Control-Expose-Headers', 'Retry-After')
+
+    def _admit_request(self, method, path):
+        """Send 503/429 and return False if the request should be rejected"""
+        if not _ready.is_set() and path not in ('/api/health', '/api/ready'):
+            self.send_response(503)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Retry-After', '1')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({'message': 'Server warming up, try again shortly'}).encode())
+            return False
+
+        if self._overloaded:
+            self.send_response(503)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Retry-After', '1')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({'message': 'Server overloaded, try again shortly'}).encode())
+            return False
+
+        auth_header = self.headers.get('Authorization') or ''
+        token = auth_header[7:] if auth_header.startswith('Bearer ') else None
+        retry_after = rate_limiter.check(method, path, token, self.client_address[0])
+        if retry_after:
+            self.send_response(429)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Retry-After', str(retry_after))
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({'message': 'Too many requests', 'retryAfter': retry_after}).encode())
+            return False
+
+        return True
 
     def do_OPTIONS(self):
         self.send_response(200)
@@ -227,6 +484,9 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
         parsed_path = urllib.parse.urlparse(self.path)
         path = parsed_path.path
 
+        if not self._admit_request('GET', path):
+            return
+
         if path == '/api/health':
             users_list = get_users()
             self.send_response(200)
@@ -240,6 +500,21 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
             }).encode())
             return
 
+        if path == '/api/ready':
+            ready = _ready.is_set()
+            if ready and 'firstReadyMs' not in _startup_stats:
+                _startup_stats['firstReadyMs'] = int((time.monotonic() - PROCESS_STARTED) * 1000)
+                print(f"✅ First healthy response {_startup_stats['firstReadyMs']} ms after start")
+            self.send_response(200 if ready else 503)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'status': 'ready' if ready else 'warming',
+                **_startup_stats
+            }).encode())
+            return
+
         if path == '/debug/users':
             users_list = get_users()
             self.send_response(200)
@@ -298,6 +573,30 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
             self.wfile.write(json.dumps(result).encode())
             return
 
+        if path == '/debug/cache':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps(message_cache.stats()).encode())
+            return
+
+        if path == '/debug/rate-limit':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps(rate_limiter.stats()).encode())
+            return
+
+        if path == '/debug/maintenance':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps(db_maintenance.get_maintenance_status()).encode())
+            return
+
         # Handle conversation messages
         if path.startswith('/api/messages/conversations/') and path.count('/') == 4:
             auth_header = self.headers.get('Authorization')
@@ -310,7 +609,13 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
                 return
 
             conversation_id = path.split('/')[-1]
-            result = get_messages_for_conversation(conversation_id)
+            query_params = urllib.parse.parse_qs(parsed_path.query)
+            include_archived = query_params.get('archived', ['0'])[0] in ('1', 'true')
+            try:
+                limit = int(query_params['limit'][0]) if 'limit' in query_params else None
+            except ValueError:
+                limit = None
+            result = get_messages_for_conversation(conversation_id, include_archived, limit)
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -327,6 +632,9 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
         self.wfile.write(json.dumps({'message': 'Not found'}).encode())
 
     def do_POST(self):
+        if not self._admit_request('POST', urllib.parse.urlparse(self.path).path):
+            return
+
         content_length = int(self.headers.get('content-length', 0))
         post_data = self.rfile.read(content_length).decode('utf-8')
         
@@ -432,11 +740,19 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
                 'id': str(uuid.uuid4()),
                 'senderId': sender_id,
                 'recipientId': recipient_id,
+                'conversationId': body.get('conversationId'),
                 'content': content
             }
 
             conversation_id = save_message(message_data)
-            print(f"✅ Message saved: {sender_id} -> {recipient_id}")
+            if not conversation_id:
+                self.send_response(403)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'Not a member of this conversation'}).encode())
+                return
+            print(f"✅ Message saved: {sender_id} -> {recipient_id or conversation_id}")
 
             self.send_response(201)
             self.send_header('Content-type', 'application/json')
@@ -451,6 +767,136 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
             }).encode())
             return
 
+        if path == '/api/messages/groups':
+            auth_header = self.headers.get('Authorization')
+            if not auth_header or not auth_header.startswith('Bearer token-'):
+                self.send_response(401)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'No token provided'}).encode())
+                return
+
+            creator_id = auth_header[13:]
+            name = body.get('name')
+            member_ids = body.get('memberIds', [])
+            if not _is_id_list(member_ids) or not (name is None or isinstance(name, str)):
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'memberIds must be a list of user ids and name a string'}).encode())
+                return
+
+            created = create_group_conversation(creator_id, name, member_ids)
+            if created is None:
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'Unknown user'}).encode())
+                return
+
+            conversation_id, member_count = created
+            print(f"✅ Group created: {name} ({member_count} members)")
+
+            self.send_response(201)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'id': conversation_id,
+                'name': name,
+                'isGroup': True,
+                'memberCount': member_count
+            }).encode())
+            return
+
+        # Add group members: POST /api/messages/conversations/<id>/members
+        if path.startswith('/api/messages/conversations/') and path.endswith('/members') and path.count('/') == 5:
+            auth_header = self.headers.get('Authorization')
+            if not auth_header or not auth_header.startswith('Bearer token-'):
+                self.send_response(401)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'No token provided'}).encode())
+                return
+
+            requester_id = auth_header[13:]
+            conversation_id = path.split('/')[-2]
+            member_ids = body.get('memberIds')
+            if not _is_id_list(member_ids):
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'memberIds must be a list of user ids'}).encode())
+                return
+
+            added = add_conversation_members(conversation_id, requester_id, member_ids)
+            if added is None:
+                self.send_response(403)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'Not a member of this group'}).encode())
+                return
+
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({'conversationId': conversation_id, 'added': added}).encode())
+            return
+
+        # Per-conversation retention: POST /api/messages/conversations/<id>/retention
+        if path.startswith('/api/messages/conversations/') and path.endswith('/retention') and path.count('/') == 5:
+            auth_header = self.headers.get('Authorization')
+            if not auth_header or not auth_header.startswith('Bearer token-'):
+                self.send_response(401)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'No token provided'}).encode())
+                return
+
+            user_id = auth_header[13:]
+            conversation_id = path.split('/')[-2]
+            if not is_conversation_member(conversation_id, user_id):
+                self.send_response(403)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({'message': 'Not a member of this conversation'}).encode())
+                return
+
+            keep_days = body.get('keepDays')
+            keep_last = body.get('keepLast')
+            # null means "use the default"; keepDays -1 means never archive
+            if not (_is_retention_value(keep_days, minimum=-1) and _is_retention_value(keep_last, minimum=0)):
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self._set_cors_headers()
+                self.end_headers()
+                self.wfile.write(json.dumps({
+                    'message': 'keepDays must be an integer >= -1 and keepLast an integer >= 0'
+                }).encode())
+                return
+
+            db_maintenance.set_conversation_retention(DB_PATH, conversation_id, keep_days, keep_last)
+
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'conversationId': conversation_id,
+                'keepDays': keep_days,
+                'keepLast': keep_last
+            }).encode())
+            return
+
         # 404
         self.send_response(404)
         self.send_header('Content-type', 'application/json')
@@ -458,18 +904,92 @@ class ChatHandler(http.server.SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(json.dumps({'message': 'Not found'}).encode())
 
+class ChatServer(socketserver.ThreadingTCPServer):
+    """Threaded so one slow client can't stall everyone; rate_limiter caps concurrency"""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+def warmup():
+    """Read hot indexes and the users table into the page cache, then preload recent conversations"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    # A full scan of each index pulls its pages into the OS and SQLite caches
+    for table, index, column in WARMUP_INDEXES:
+        try:
+            cursor.execute(f'SELECT COUNT({column}) FROM {table} INDEXED BY {index}')
+            cursor.fetchone()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ Warmup skipped {index}: {e}")
+    
+    # Users aren't cached in process; this only warms the pages get_users() reads
+    user_count = cursor.execute('SELECT COUNT(is_online) FROM users').fetchone()[0]
+    
+    # Recent rowids approximate the most recently active conversations
+    cursor.execute('''
+        SELECT DISTINCT conversation_id FROM (
+            SELECT conversation_id FROM messages ORDER BY rowid DESC LIMIT ?
+        )
+        LIMIT ?
+    ''', (WARMUP_CONVERSATIONS * 20, WARMUP_CONVERSATIONS))
+    conversation_ids = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    
+    for conversation_id in conversation_ids:
+        # Straight into the cache, so warmup doesn't count as misses
+        load_token = message_cache.load_token()
+        messages, complete = _read_messages(conversation_id, False, message_cache.tail_size)
+        message_cache.put(conversation_id, messages, complete, load_token)
+    
+    return {'users': user_count, 'conversations': len(conversation_ids)}
+
+def _run_warmup():
+    started = time.monotonic()
+    try:
+        _startup_stats['warmup'] = warmup()
+    except Exception as e:
+        print(f"❌ Warmup error: {e}")
+    _startup_stats['warmupMs'] = int((time.monotonic() - started) * 1000)
+    _ready.set()
+    print(f"🔥 Warmup done in {_startup_stats['warmupMs']} ms")
+
+def create_server(port=PORT, db_path=None, warm=True):
+    """Build the chat server: init the database, start maintenance and warmup.
+
+    The listener is bound straight away so /api/health and /api/ready
+    answer during warmup; every other route returns 503 until it ends.
+    """
+    global DB_PATH
+    if db_path:
+        DB_PATH = db_path
+    
+    started = time.monotonic()
+    ensure_database(DB_PATH)
+    _startup_stats['initMs'] = int((time.monotonic() - started) * 1000)
+    
+    httpd = ChatServer(("", port), ChatHandler)
+    db_maintenance.start_maintenance_thread(DB_PATH, on_archived=message_cache.invalidate)
+    
+    if warm:
+        threading.Thread(target=_run_warmup, name='warmup', daemon=True).start()
+    else:
+        _ready.set()
+    return httpd
+
 if __name__ == '__main__':
-    PORT = 3001
-    with socketserver.TCPServer(("", PORT), ChatHandler) as httpd:
+    with create_server() as httpd:
         print('')
         print('🚀🚀🚀 MULTI-USER CHAT SERVER STARTED! 🚀🚀🚀')
         print('')
         print(f'📍 Server: http://localhost:{PORT}')
         print('👥 Users share the SAME data!')
         print(f'🔍 Debug: http://localhost:{PORT}/debug/users')
+        print(f'🩺 Ready: http://localhost:{PORT}/api/ready')
         print('')
         print('✅ Ready for multiple users to connect!')
         print('✅ Each user will see all other users!')
         print('✅ Real-time messaging between users!')
+        print(f'🧹 Maintenance: every {db_maintenance.MAINTENANCE_INTERVAL_SECONDS // 60} min ({db_maintenance.DEFAULT_KEEP_DAYS}-day retention)')
         print('')
         httpd.serve_forever()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+import sqlite3
+import os
+import contextlib
+import threading
+import argparse
+from datetime import datetime
+
+
+# Retention defaults (overridable per conversation via conversation_retention)
+DEFAULT_KEEP_DAYS = 90
+DEFAULT_KEEP_LAST = 200
+
+# Maintenance schedule
+MAINTENANCE_INTERVAL_SECONDS = 15 * 60
+ARCHIVE_BATCH_SIZE = 500
+INCREMENTAL_VACUUM_PAGES = 1000
+
+_stop_event = threading.Event()
+_maintenance_thread = None
+_last_run = {}
+
+
+def archive_path_for(db_path):
+    """Archive database for a main database: db/chat.db -> db/chat_archive.db"""
+    return os.path.splitext(db_path)[0] + '_archive.db'
+
+
+def init_archive_database(archive_path):
+    """Create the archive database and its messages table"""
+    conn = sqlite3.connect(archive_path)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA journal_mode = WAL')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            id TEXT PRIMARY KEY,
+            conversation_id TEXT NOT NULL,
+            sender_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TEXT,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_archive_messages_conversation
+        ON messages (conversation_id, created_at)
+    ''')
+
+    conn.commit()
+    conn.close()
+
+
+def init_retention_table(cursor):
+    """Create the per-conversation retention table on an open cursor"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_retention (
+            conversation_id TEXT PRIMARY KEY,
+            keep_days INTEGER,
+            keep_last INTEGER,
+            FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+        )
+    ''')
+
+
+def set_conversation_retention(db_path, conversation_id, keep_days=None, keep_last=None):
+    """Set retention for one conversation (None falls back to the defaults)"""
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        conn.execute('''
+            INSERT INTO conversation_retention (conversation_id, keep_days, keep_last)
+            VALUES (?, ?, ?)
+            ON CONFLICT(conversation_id) DO UPDATE SET
+                keep_days = excluded.keep_days,
+                keep_last = excluded.keep_last
+        ''', (conversation_id, keep_days, keep_last))
+        conn.commit()
+
+
+def archive_old_messages(db_path, archive_path=None, batch_size=ARCHIVE_BATCH_SIZE, on_archived=None):
+    """Move cold messages into the archive database in small batches.
+
+    A message is cold when it is older than the conversation's keep_days
+    and not among its keep_last most recent messages. Each conversation's
+    cold range is found with two index seeks on idx_messages_conversation
+    and walked by keyset, so a pass costs O(cold rows), not a rescan of
+    the table per batch. Each batch is its own short transaction so
+    request handling is never blocked for long. on_archived is called
+    with each conversation id that lost messages.
+    """
+    archive_path = archive_path or archive_path_for(db_path)
+    init_archive_database(archive_path)
+
+    conn = sqlite3.connect(db_path, timeout=1)
+    cursor = conn.cursor()
+    init_retention_table(cursor)
+    conn.commit()
+    cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+
+    cursor.execute('''
+        SELECT c.id, COALESCE(r.keep_days, ?), COALESCE(r.keep_last, ?)
+        FROM main.conversations c
+        LEFT JOIN main.conversation_retention r ON r.conversation_id = c.id
+    ''', (DEFAULT_KEEP_DAYS, DEFAULT_KEEP_LAST))
+    policies = cursor.fetchall()
+
+    moved = 0
+    pending = []
+    for conversation_id, keep_days, keep_last in policies:
+        if _stop_event.is_set():
+            break
+        if keep_days < 0:
+            continue
+
+        # Newest message that falls outside keep_last; everything at or before it may go
+        cursor.execute('''
+            SELECT created_at, rowid FROM main.messages
+            WHERE conversation_id = ?
+            ORDER BY created_at DESC, rowid DESC
+            LIMIT 1 OFFSET ?
+        ''', (conversation_id, keep_last))
+        boundary = cursor.fetchone()
+        if not boundary:
+            continue
+
+        cutoff = cursor.execute("SELECT datetime('now', ?)", (f'-{keep_days} days',)).fetchone()[0]
+        after = ('', 0)
+        while True:
+            cursor.execute('''
+                SELECT created_at, rowid FROM main.messages
+                WHERE conversation_id = ?
+                  AND created_at < ?
+                  AND (created_at, rowid) <= (?, ?)
+                  AND (created_at, rowid) > (?, ?)
+                ORDER BY created_at, rowid
+                LIMIT ?
+            ''', (conversation_id, cutoff, boundary[0], boundary[1], after[0], after[1],
+                  batch_size - len(pending)))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            after = rows[-1]
+            pending.extend((row[1], conversation_id) for row in rows)
+
+            if len(pending) >= batch_size:
+                if not _move_batch(conn, cursor, pending, on_archived):
+                    conn.close()
+                    return moved
+                moved += len(pending)
+                pending = []
+
+    if pending and _move_batch(conn, cursor, pending, on_archived):
+        moved += len(pending)
+
+    conn.close()
+    return moved
+
+
+def _move_batch(conn, cursor, batch, on_archived):
+    """Copy (rowid, conversation_id) rows to the archive and delete them; False if busy"""
+    rowids = [row[0] for row in batch]
+    placeholders = ','.join('?' * len(rowids))
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        # Insert before delete: an interrupted batch leaves a duplicate, never a loss
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO archive.messages (id, conversation_id, sender_id, content, created_at)
+            SELECT id, conversation_id, sender_id, content, created_at
+            FROM main.messages WHERE rowid IN ({placeholders})
+        ''', rowids)
+        cursor.execute(f'DELETE FROM main.messages WHERE rowid IN ({placeholders})', rowids)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        # Database busy with request traffic; try again next run
+        conn.rollback()
+        print(f"⚠️ Archive batch skipped: {e}")
+        return False
+
+    if on_archived:
+        for conversation_id in {row[1] for row in batch}:
+            on_archived(conversation_id)
+    return True
+
+
+def get_archived_messages(cursor, conversation_id, archive_path):
+    """Read archived rows for a conversation using an open main-db cursor"""
+    if not os.path.exists(archive_path):
+        return []
+
+    cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+    try:
+        cursor.execute('''
+            SELECT m.id, m.content, m.sender_id, m.created_at, u.display_name, u.username
+            FROM archive.messages m
+            JOIN main.users u ON m.sender_id = u.id
+            WHERE m.conversation_id = ?
+            ORDER BY m.created_at
+        ''', (conversation_id,))
+        return cursor.fetchall()
+    finally:
+        cursor.execute('DETACH DATABASE archive')
+
+
+def enable_incremental_vacuum(db_path):
+    """Switch an existing database to incremental auto-vacuum (one full VACUUM)"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def compact_database(db_path, vacuum_pages=INCREMENTAL_VACUUM_PAGES):
+    """Reclaim free pages, refresh planner stats and checkpoint the WAL.
+
+    Every step is non-blocking: incremental vacuum is capped at
+    vacuum_pages, and the checkpoint is PASSIVE so it never waits on
+    readers or writers.
+    """
+    conn = sqlite3.connect(db_path, timeout=1)
+    cursor = conn.cursor()
+    result = {}
+
+    try:
+        auto_vacuum = cursor.execute('PRAGMA auto_vacuum').fetchone()[0]
+        if auto_vacuum == 2:
+            cursor.execute(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+            cursor.fetchall()
+        result['freePages'] = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+
+        cursor.execute('PRAGMA optimize')
+
+        busy, log_frames, checkpointed = cursor.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        result['walFrames'] = log_frames
+        result['walCheckpointed'] = checkpointed
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ Compaction step skipped: {e}")
+    finally:
+        conn.close()
+
+    return result
+
+
+def run_maintenance(db_path, archive_path=None, on_archived=None):
+    """Run one full maintenance pass: archive, then compact both databases"""
+    archive_path = archive_path or archive_path_for(db_path)
+    started = datetime.now()
+    archived = archive_old_messages(db_path, archive_path, on_archived=on_archived)
+    main_stats = compact_database(db_path)
+    compact_database(archive_path)
+
+    _last_run.clear()
+    _last_run.update({
+        'startedAt': started.isoformat(),
+        'durationMs': int((datetime.now() - started).total_seconds() * 1000),
+        'archived': archived,
+        **main_stats
+    })
+    if archived:
+        print(f"🧹 Maintenance archived {archived} messages")
+    return dict(_last_run)
+
+
+def get_maintenance_status():
+    """Stats from the most recent maintenance pass"""
+    return dict(_last_run)
+
+
+def _maintenance_loop(db_path, archive_path, interval, on_archived):
+    while not _stop_event.wait(interval):
+        try:
+            run_maintenance(db_path, archive_path, on_archived)
+        except Exception as e:
+            print(f"❌ Maintenance error: {e}")
+
+
+def start_maintenance_thread(db_path, archive_path=None, interval=MAINTENANCE_INTERVAL_SECONDS,
+                             on_archived=None):
+    """Run maintenance on a daemon thread so the request loop is never blocked"""
+    global _maintenance_thread
+    if _maintenance_thread and _maintenance_thread.is_alive():
+        return _maintenance_thread
+
+    _stop_event.clear()
+    _maintenance_thread = threading.Thread(
+        target=_maintenance_loop,
+        args=(db_path, archive_path, interval, on_archived),
+        name='db-maintenance',
+        daemon=True
+    )
+    _maintenance_thread.start()
+    return _maintenance_thread
+
+
+def stop_maintenance_thread():
+    """Signal the maintenance thread to stop after the current batch"""
+    _stop_event.set()
+
+
+if __name__ == '__main__':
+    # The archive is always <db>_archive.db, the path chat_server reads ?archived=1 from
+    parser = argparse.ArgumentParser(description='Archive and compact the chat database')
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), 'db', 'chat.db'))
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='one-time full VACUUM to switch on incremental auto-vacuum')
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        print("✅ Incremental auto-vacuum enabled")
+
+    print(f"✅ Maintenance done: {run_maintenance(args.db)}")
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""Stream chat data between SQLite and NDJSON.
+
+Each line is one record with a "type" of user, status, conversation or
+message. Records use the same camelCase shape as the in-memory
+chat-server.py, so a file exported here can seed it (python chat-server.py
+data.ndjson). Exports include messages moved to <db>_archive.db by
+db_maintenance.py.
+
+The Node server (server/db/init.js) shares db/chat.db and has columns the
+Python schema lacks (NODE_COLUMNS, plus the statuses table). They are
+exported when the source has them, and import creates them, so an
+imported file works with either server.
+
+    python db_transfer.py export data.ndjson
+    python db_transfer.py import [--resume] data.ndjson
+    python db_transfer.py generate --messages 3000000 > seed.ndjson
+"""
+import sqlite3
+import os
+import sys
+import json
+import random
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import chat_server
+import db_maintenance
+
+IMPORT_BATCH_SIZE = 50000
+
+_decode = json.JSONDecoder().raw_decode
+
+# Tables whose secondary indexes are dropped during import and rebuilt after
+IMPORT_TABLES = ('users', 'conversations', 'conversation_participants', 'messages', 'statuses')
+
+# Node-only columns: (table, column, declaration, record key)
+NODE_COLUMNS = [
+    ('users', 'avatar_url', 'TEXT', 'avatarUrl'),
+    ('users', 'bio', 'TEXT', 'bio'),
+    ('users', 'last_seen', 'TEXT', 'lastSeen'),
+    ('conversation_participants', 'joined_at', 'TEXT', 'joinedAt'),
+    ('messages', 'is_read', 'INTEGER DEFAULT 0', 'isRead'),
+]
+
+
+def _open_output(path):
+    return sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+
+
+def _columns(cursor, table):
+    return {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+
+
+def _node_columns(cursor, table):
+    """(column, record key) pairs for the Node-only columns this database has"""
+    present = _columns(cursor, table)
+    return [(column, key) for node_table, column, _, key in NODE_COLUMNS
+            if node_table == table and column in present]
+
+
+def ensure_node_schema(cursor):
+    """Add the Node server's columns and statuses table if they are missing"""
+    for table, column, declaration, _ in NODE_COLUMNS:
+        if column not in _columns(cursor, table):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS statuses (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            expires_at TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+
+def export_ndjson(db_path, out_path, include_archived=True):
+    """Write every user, status, conversation and message as NDJSON; memory stays flat.
+
+    Archived messages are read from <db>_archive.db when it exists and
+    written after the live ones.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    out = _open_output(out_path)
+    counts = {'user': 0, 'status': 0, 'conversation': 0, 'message': 0, 'archived': 0}
+
+    user_extra = _node_columns(cursor, 'users')
+    message_extra = _node_columns(cursor, 'messages')
+    has_joined_at = bool(_node_columns(cursor, 'conversation_participants'))
+    has_statuses = bool(_columns(cursor, 'statuses'))
+    archive_path = db_maintenance.archive_path_for(db_path)
+
+    try:
+        extra_sql = ''.join(f', {column}' for column, _ in user_extra)
+        for row in cursor.execute(f'SELECT id, email, username, password, display_name, is_online, created_at{extra_sql} FROM users'):
+            record = {
+                'type': 'user', 'id': row[0], 'email': row[1], 'username': row[2], 'password': row[3],
+                'displayName': row[4], 'isOnline': bool(row[5]), 'createdAt': row[6]
+            }
+            record.update(zip((key for _, key in user_extra), row[7:]))
+            out.write(json.dumps(record) + '\n')
+            counts['user'] += 1
+
+        if has_statuses:
+            for row in cursor.execute('SELECT id, user_id, content, expires_at, created_at FROM statuses'):
+                out.write(json.dumps({
+                    'type': 'status', 'id': row[0], 'userId': row[1], 'content': row[2],
+                    'expiresAt': row[3], 'createdAt': row[4]
+                }) + '\n')
+                counts['status'] += 1
+
+        joined_sql = ''',
+                (SELECT json_group_object(user_id, joined_at) FROM conversation_participants
+                 WHERE conversation_id = c.id)''' if has_joined_at else ''
+        for row in cursor.execute(f'''
+            SELECT c.id, c.is_group, c.name, c.created_at,
+                (SELECT json_group_array(user_id) FROM conversation_participants
+                 WHERE conversation_id = c.id){joined_sql}
+            FROM conversations c
+        '''):
+            record = {
+                'type': 'conversation', 'id': row[0], 'isGroup': bool(row[1]), 'name': row[2],
+                'participants': json.loads(row[4]), 'createdAt': row[3]
+            }
+            if has_joined_at:
+                record['joinedAt'] = json.loads(row[5])
+            out.write(json.dumps(record) + '\n')
+            counts['conversation'] += 1
+
+        extra_sql = ''.join(f', {column}' for column, _ in message_extra)
+        for row in cursor.execute(f'SELECT id, conversation_id, sender_id, content, created_at{extra_sql} FROM messages ORDER BY rowid'):
+            record = {
+                'type': 'message', 'id': row[0], 'conversationId': row[1], 'senderId': row[2],
+                'content': row[3], 'createdAt': row[4]
+            }
+            if message_extra:
+                record['isRead'] = bool(row[5])
+            out.write(json.dumps(record) + '\n')
+            counts['message'] += 1
+
+        if include_archived and os.path.exists(archive_path):
+            cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+            # An interrupted archive batch can leave a row in both databases
+            for row in cursor.execute('''
+                SELECT a.id, a.conversation_id, a.sender_id, a.content, a.created_at
+                FROM archive.messages a
+                WHERE NOT EXISTS (SELECT 1 FROM main.messages m WHERE m.id = a.id)
+                ORDER BY a.rowid
+            '''):
+                out.write(json.dumps({
+                    'type': 'message', 'id': row[0], 'conversationId': row[1], 'senderId': row[2],
+                    'content': row[3], 'createdAt': row[4]
+                }) + '\n')
+                counts['archived'] += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        conn.close()
+
+    return counts
+
+
+def _init_progress_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            offset INTEGER NOT NULL,
+            deferred_indexes TEXT NOT NULL
+        )
+    ''')
+
+
+def _find_indexes(cursor):
+    """Secondary indexes on the import tables as [name, sql] pairs"""
+    placeholders = ','.join('?' * len(IMPORT_TABLES))
+    cursor.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+    ''', IMPORT_TABLES)
+    return [list(row) for row in cursor.fetchall()]
+
+
+def _drop_indexes(cursor, indexes):
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def _flush(cursor, users, statuses, conversations, participants, messages):
+    cursor.executemany('''
+        INSERT OR IGNORE INTO users (id, email, username, password, display_name, is_online, created_at,
+                                     avatar_url, bio, last_seen)
+        VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?)
+    ''', users)
+    cursor.executemany('''
+        INSERT OR IGNORE INTO statuses (id, user_id, content, expires_at, created_at)
+        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ''', statuses)
+    cursor.executemany('''
+        INSERT OR IGNORE INTO conversations (id, is_group, name, created_at)
+        VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ''', conversations)
+    cursor.executemany('''
+        INSERT OR IGNORE INTO conversation_participants (conversation_id, user_id, joined_at)
+        VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ''', participants)
+    cursor.executemany('''
+        INSERT OR IGNORE INTO messages (id, conversation_id, sender_id, content, created_at, is_read)
+        VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+    ''', messages)
+    for batch in (users, statuses, conversations, participants, messages):
+        batch.clear()
+
+
+class UnfinishedImportError(Exception):
+    pass
+
+
+def import_ndjson(db_path, in_path, batch_size=IMPORT_BATCH_SIZE, resume=False):
+    """Load NDJSON in batched transactions, optionally resuming an interrupted run.
+
+    Secondary indexes are dropped up front and rebuilt once at the end.
+    Progress (byte offset plus the deferred index SQL) is committed in
+    the same transaction as each batch, so an interrupted import picks
+    up after the last committed batch and still restores the indexes.
+    Until then the database has no secondary indexes, so a new import
+    is refused while one is unfinished, and resume=True must name the
+    same file.
+    """
+    chat_server.init_database(db_path)
+    source = os.path.abspath(in_path)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA synchronous = NORMAL')
+    cursor.execute('PRAGMA cache_size = -65536')
+    ensure_node_schema(cursor)
+    _init_progress_table(cursor)
+
+    unfinished = [row[0] for row in cursor.execute('SELECT source FROM import_progress')]
+    if unfinished and (not resume or source not in unfinished):
+        conn.close()
+        raise UnfinishedImportError(
+            f"Unfinished import of {unfinished[0]}; its indexes are still dropped. "
+            f"Finish it first with: db_transfer.py import --resume {unfinished[0]}")
+
+    cursor.execute('SELECT offset, deferred_indexes FROM import_progress WHERE source = ?', (source,))
+    progress = cursor.fetchone()
+    if progress:
+        offset, indexes = progress[0], json.loads(progress[1])
+        print(f"↩️ Resuming import of {in_path} at byte {offset}")
+    else:
+        offset, indexes = 0, _find_indexes(cursor)
+        cursor.execute('INSERT INTO import_progress (source, offset, deferred_indexes) VALUES (?, 0, ?)',
+                       (source, json.dumps(indexes)))
+    # Also drops any that init_database recreated since an interrupted run
+    _drop_indexes(cursor, indexes)
+    conn.commit()
+
+    users, statuses, conversations, participants, messages = [], [], [], [], []
+    pending = 0
+    imported = 0
+
+    with open(in_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+
+            # raw_decode on str skips json.loads' per-call encoding detection
+            record = _decode(line.decode('utf-8').lstrip())[0]
+            kind = record.get('type')
+            if kind == 'message':
+                messages.append((record['id'], record['conversationId'], record['senderId'],
+                                 record['content'], record.get('createdAt'), 1 if record.get('isRead') else 0))
+            elif kind == 'conversation':
+                conversations.append((record['id'], 1 if record.get('isGroup') else 0,
+                                      record.get('name'), record.get('createdAt')))
+                joined_at = record.get('joinedAt') or {}
+                participants.extend((record['id'], user_id, joined_at.get(user_id))
+                                    for user_id in record.get('participants', []))
+            elif kind == 'user':
+                users.append((record['id'], record['email'], record['username'], record.get('password') or '',
+                              record.get('displayName'), 1 if record.get('isOnline') else 0,
+                              record.get('createdAt'), record.get('avatarUrl'), record.get('bio'),
+                              record.get('lastSeen')))
+            elif kind == 'status':
+                statuses.append((record['id'], record['userId'], record['content'],
+                                 record.get('expiresAt'), record.get('createdAt')))
+            else:
+                continue
+
+            pending += 1
+            if pending >= batch_size:
+                _flush(cursor, users, statuses, conversations, participants, messages)
+                cursor.execute('UPDATE import_progress SET offset = ? WHERE source = ?', (offset, source))
+                conn.commit()
+                imported += pending
+                pending = 0
+
+    _flush(cursor, users, statuses, conversations, participants, messages)
+    imported += pending
+
+    print(f"🔧 Rebuilding {len(indexes)} indexes")
+    for _, sql in indexes:
+        cursor.execute(sql)
+    cursor.execute('DELETE FROM import_progress WHERE source = ?', (source,))
+    conn.commit()
+
+    cursor.execute('PRAGMA optimize')
+    conn.close()
+    return imported
+
+
+def generate_ndjson(out_path, user_count, conversation_count, message_count, seed=0):
+    """Write synthetic users, direct chats and messages for staging/load tests"""
+    rng = random.Random(seed)
+    out = _open_output(out_path)
+    start = datetime(2024, 1, 1)
+
+    try:
+        for i in range(user_count):
+            out.write(json.dumps({
+                'type': 'user', 'id': f'user-{i}', 'email': f'user{i}@example.com', 'username': f'user{i}',
+                'password': 'password', 'displayName': f'User {i}', 'isOnline': False
+            }) + '\n')
+
+        conversation_members = []
+        for i in range(conversation_count):
+            members = rng.sample(range(user_count), 2)
+            conversation_members.append(members)
+            out.write(json.dumps({
+                'type': 'conversation', 'id': f'conv-{i}', 'isGroup': False, 'name': None,
+                'participants': [f'user-{m}' for m in members]
+            }) + '\n')
+
+        step = timedelta(days=365) / max(message_count, 1)
+        for i in range(message_count):
+            conv = rng.randrange(conversation_count)
+            out.write(json.dumps({
+                'type': 'message', 'id': f'msg-{i}', 'conversationId': f'conv-{conv}',
+                'senderId': f'user-{rng.choice(conversation_members[conv])}',
+                'content': f'Message {i}', 'createdAt': (start + step * i).isoformat(' ', 'seconds')
+            }) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import/export for the chat database')
+    parser.add_argument('--db', default=chat_server.DB_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='write the database to NDJSON')
+    export_parser.add_argument('path', help="output file, or - for stdout")
+    export_parser.add_argument('--no-archived', dest='include_archived', action='store_false',
+                               help='skip messages moved to <db>_archive.db')
+
+    import_parser = commands.add_parser('import', help='load NDJSON into the database (resumable)')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    import_parser.add_argument('--resume', action='store_true',
+                               help='continue an interrupted import of the same file')
+
+    generate_parser = commands.add_parser('generate', help='write synthetic NDJSON for load tests')
+    generate_parser.add_argument('path', nargs='?', default='-')
+    generate_parser.add_argument('--users', type=int, default=1000)
+    generate_parser.add_argument('--conversations', type=int, default=5000)
+    generate_parser.add_argument('--messages', type=int, default=100000)
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    started = time.time()
+
+    if args.command == 'export':
+        counts = export_ndjson(args.db, args.path, args.include_archived)
+        print(f"✅ Exported {counts} in {time.time() - started:.1f}s", file=sys.stderr)
+    elif args.command == 'import':
+        try:
+            imported = import_ndjson(args.db, args.path, args.batch_size, args.resume)
+        except UnfinishedImportError as e:
+            sys.exit(f"❌ {e}")
+        print(f"✅ Imported {imported} records in {time.time() - started:.1f}s")
+    else:
+        generate_ndjson(args.path, args.users, args.conversations, args.messages, args.seed)
+        print(f"✅ Generated {args.messages} messages in {time.time() - started:.1f}s", file=sys.stderr)
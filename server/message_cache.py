@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import threading
+import time
+from collections import OrderedDict
+
+# Most recent messages kept per conversation
+CACHE_TAIL_SIZE = 50
+
+# Total memory budget across all cached conversations
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Entries are reloaded this long after being read from the database, so
+# writes made outside this process (Node server, db_transfer.py) show up
+CACHE_MAX_AGE_SECONDS = 30
+
+# Recent writes remembered for rejecting stale loads (see put)
+_MAX_TRACKED_WRITES = 10000
+
+# Rough per-message overhead for the dict and its keys
+_MESSAGE_OVERHEAD_BYTES = 400
+
+# Rough per-entry overhead for the key, _Entry and its OrderedDict slot, so
+# empty conversations still count against max_bytes
+_ENTRY_OVERHEAD_BYTES = 300
+
+
+def _estimate_size(message):
+    return _MESSAGE_OVERHEAD_BYTES + sum(len(str(v)) for v in message.values())
+
+
+class _Entry:
+    __slots__ = ('messages', 'complete', 'size', 'loaded_at')
+
+    def __init__(self, conversation_id, messages, complete):
+        self.messages = messages
+        # True when messages holds the whole conversation, not just its tail
+        self.complete = complete
+        self.size = _ENTRY_OVERHEAD_BYTES + len(conversation_id) + sum(_estimate_size(m) for m in messages)
+        self.loaded_at = time.monotonic()
+
+
+class MessageCache:
+    """LRU cache of the newest messages of hot conversations.
+
+    Entries are updated in place by save_message, so an active chat
+    never has to be reloaded from SQLite after a write from this process.
+    Writes from other processes are only picked up when an entry
+    expires after max_age seconds.
+    """
+
+    def __init__(self, tail_size=CACHE_TAIL_SIZE, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE_SECONDS):
+        self.tail_size = tail_size
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Write generation: bumped by append/invalidate, checked by put
+        self._generation = 0
+        self._written = OrderedDict()
+        self._forgotten_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_loads = 0
+
+    def get_tail(self, conversation_id, limit=None):
+        """Cached messages (oldest first), or None if the cache can't answer.
+
+        With no limit the cache only answers when it holds the whole
+        conversation.
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None and time.monotonic() - entry.loaded_at > self.max_age:
+                self._remove(conversation_id)
+                entry = None
+            if entry is None or (limit is None and not entry.complete) \
+                    or (limit is not None and len(entry.messages) < limit and not entry.complete):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            if limit is None:
+                return list(entry.messages)
+            return entry.messages[-limit:] if limit > 0 else []
+
+    def load_token(self):
+        """Call before reading from the database; pass the result to put()"""
+        with self._lock:
+            return self._generation
+
+    def put(self, conversation_id, messages, complete, load_token):
+        """Store the tail of a conversation loaded from the database.
+
+        Skipped if append/invalidate touched the conversation after
+        load_token was taken, since messages may then miss that write.
+        Returns whether the entry was stored.
+        """
+        tail = list(messages[-self.tail_size:])
+        entry = _Entry(conversation_id, tail, complete and len(messages) <= self.tail_size)
+        with self._lock:
+            if self._written.get(conversation_id, self._forgotten_generation) > load_token:
+                self.stale_loads += 1
+                return False
+            self._remove(conversation_id)
+            self._entries[conversation_id] = entry
+            self._bytes += entry.size
+            self._evict()
+            return True
+
+    def append(self, conversation_id, message, new_conversation=False):
+        """Add a just-saved message to a cached conversation.
+
+        Conversations that aren't cached are left alone, except brand new
+        ones, which are known to be complete.
+        """
+        with self._lock:
+            self._record_write(conversation_id)
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                if not new_conversation:
+                    return
+                entry = _Entry(conversation_id, [], True)
+                self._entries[conversation_id] = entry
+                self._bytes += entry.size
+            elif any(m['id'] == message['id'] for m in entry.messages):
+                # A load that started after the commit already picked it up
+                return
+
+            entry.messages.append(message)
+            size = _estimate_size(message)
+            entry.size += size
+            self._bytes += size
+
+            while len(entry.messages) > self.tail_size:
+                size = _estimate_size(entry.messages.pop(0))
+                entry.size -= size
+                self._bytes -= size
+                entry.complete = False
+
+            self._entries.move_to_end(conversation_id)
+            self._evict()
+
+    def invalidate(self, conversation_id):
+        with self._lock:
+            self._record_write(conversation_id)
+            self._remove(conversation_id)
+
+    def is_cached(self, conversation_id):
+        with self._lock:
+            return conversation_id in self._entries
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.stale_loads = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'staleLoads': self.stale_loads,
+                'conversations': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'tailSize': self.tail_size
+            }
+
+    def _record_write(self, conversation_id):
+        self._generation += 1
+        self._written[conversation_id] = self._generation
+        self._written.move_to_end(conversation_id)
+        if len(self._written) > _MAX_TRACKED_WRITES:
+            # Forgotten writes count as "just now" for every untracked conversation
+            _, self._forgotten_generation = self._written.popitem(last=False)
+
+    def _remove(self, conversation_id):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import threading
+import time
+import math
+from collections import OrderedDict
+
+# Per-route limits: (method, path, prefix match, token rate, token burst, IP rate, IP burst)
+# Rates are tokens per second. Every route has a per-IP bucket, and tokens
+# are unverified strings, so the IP limit is what stops a client that
+# rotates tokens. A route with a None token rate is limited per IP only.
+ROUTE_LIMITS = [
+    ('POST', '/api/auth/login', False, None, None, 0.2, 5),
+    ('POST', '/api/auth/register', False, None, None, 0.05, 3),
+    ('POST', '/api/messages/send', False, 5, 20, 20, 80),
+    ('POST', '/api/messages/groups', False, 0.1, 5, 0.5, 20),
+    ('POST', '/api/messages/conversations/', True, 1, 5, 4, 20),
+    ('GET', '/api/messages/conversations', False, 1, 10, 4, 40),
+    ('GET', '/api/messages/conversations/', True, 5, 20, 20, 80),
+    ('GET', '/api/users/', False, 1, 10, 4, 40),
+]
+
+# Reject with 503 once this many requests are being handled at the same time
+MAX_IN_FLIGHT = 64
+
+# Least recently used buckets are dropped beyond this many
+MAX_BUCKETS = 10000
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now):
+        """Refill, then return seconds until a token is available (0 if one is)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """In-memory token buckets per route and client, plus a global in-flight cap"""
+
+    def __init__(self, route_limits=ROUTE_LIMITS, max_in_flight=MAX_IN_FLIGHT):
+        self.route_limits = route_limits
+        self.max_in_flight = max_in_flight
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.limited = 0
+        self.overloaded = 0
+
+    def _match(self, method, path):
+        for route_method, route_path, prefix, *limits in self.route_limits:
+            if route_method != method:
+                continue
+            if path == route_path or (prefix and path.startswith(route_path)):
+                return route_path, limits
+        return None
+
+    def check(self, method, path, token, client_ip):
+        """Seconds the client must wait before retrying, or 0 if allowed.
+
+        A token is only taken when both the per-token and per-IP buckets
+        have one, so a request rejected by one doesn't drain the other.
+        """
+        route = self._match(method, path)
+        if route is None:
+            return 0
+
+        route_path, (token_rate, token_burst, ip_rate, ip_burst) = route
+        limits = [(('ip', method, route_path, client_ip), ip_rate, ip_burst)]
+        if token and token_rate is not None:
+            limits.append((('token', method, route_path, token), token_rate, token_burst))
+        now = time.monotonic()
+
+        with self._lock:
+            buckets = [self._bucket(bucket_key, rate, burst) for bucket_key, rate, burst in limits]
+            wait = max(bucket.wait_time(now) for bucket in buckets)
+            if wait:
+                self.limited += 1
+            else:
+                for bucket in buckets:
+                    bucket.tokens -= 1
+        return math.ceil(wait)
+
+    def begin_request(self):
+        """Count a request as in flight; returns False if the server is overloaded"""
+        with self._lock:
+            self.in_flight += 1
+            if self.in_flight > self.max_in_flight:
+                self.overloaded += 1
+                return False
+            return True
+
+    def end_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inFlight': self.in_flight,
+                'maxInFlight': self.max_in_flight,
+                'buckets': len(self._buckets),
+                'limited': self.limited,
+                'overloaded': self.overloaded
+            }
+
+    def _bucket(self, bucket_key, rate, burst):
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = TokenBucket(rate, burst)
+            if len(self._buckets) > MAX_BUCKETS:
+                # O(1) LRU eviction; buckets in active use stay at the recent end
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(bucket_key)
+        return bucket
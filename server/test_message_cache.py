@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import chat_server
+from message_cache import MessageCache
+
+
+def _message(message_id):
+    return {'id': message_id, 'content': message_id, 'senderId': 'a'}
+
+
+class MessageCacheTest(unittest.TestCase):
+    def test_put_after_concurrent_append_is_rejected(self):
+        cache = MessageCache()
+        token = cache.load_token()
+        cache.append('c1', _message('m1'))  # committed while the load was reading
+        self.assertFalse(cache.put('c1', [_message('m0')], True, token))
+        self.assertIsNone(cache.get_tail('c1'))
+
+    def test_append_skips_message_already_loaded(self):
+        cache = MessageCache()
+        cache.put('c1', [_message('m0'), _message('m1')], True, cache.load_token())
+        cache.append('c1', _message('m1'))
+        self.assertEqual([m['id'] for m in cache.get_tail('c1')], ['m0', 'm1'])
+
+    def test_entries_expire_after_max_age(self):
+        cache = MessageCache(max_age=0)
+        cache.put('c1', [_message('m0')], True, cache.load_token())
+        self.assertIsNone(cache.get_tail('c1'))
+
+    def test_empty_entries_count_against_max_bytes(self):
+        cache = MessageCache(max_bytes=1024)
+        for i in range(1000):
+            cache.put(f'bogus-{i}', [], True, cache.load_token())
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 1024)
+        self.assertLess(stats['conversations'], 10)
+        self.assertEqual(stats['evictions'], 1000 - stats['conversations'])
+
+
+class SaveDuringLoadTest(unittest.TestCase):
+    """A send that commits between a cache miss's SELECT and its put()"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.original_db_path = chat_server.DB_PATH
+        chat_server.DB_PATH = os.path.join(self.tmp.name, 'chat.db')
+        chat_server.init_database(chat_server.DB_PATH)
+        chat_server.message_cache = MessageCache()
+
+        conn = sqlite3.connect(chat_server.DB_PATH)
+        conn.executemany(
+            "INSERT INTO users (id, email, username, password, display_name) VALUES (?, ?, ?, '', ?)",
+            [('a', 'a@x', 'a', 'A'), ('b', 'b@x', 'b', 'B')])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        chat_server.DB_PATH = self.original_db_path
+        chat_server.message_cache = MessageCache()
+        self.tmp.cleanup()
+
+    def _send(self, message_id):
+        return chat_server.save_message({'id': message_id, 'senderId': 'a', 'recipientId': 'b', 'content': message_id})
+
+    def test_message_saved_during_load_is_not_lost(self):
+        conv_id = self._send('m0')
+        chat_server.message_cache.invalidate(conv_id)
+
+        cache = chat_server.message_cache
+        real_put = cache.put
+
+        def put_after_concurrent_send(*args):
+            cache.put = real_put
+            self._send('m1')
+            return real_put(*args)
+
+        cache.put = put_after_concurrent_send
+        chat_server.get_messages_for_conversation(conv_id, limit=10)
+        self._send('m2')
+
+        history = chat_server.get_messages_for_conversation(conv_id, limit=10)
+        self.assertEqual([m['id'] for m in history], ['m0', 'm1', 'm2'])
+
+
+if __name__ == '__main__':
+    unittest.main()